@@ -10,9 +10,11 @@ ENV_PATH = os.path.join(BASE_DIR, '.env')
 if os.path.exists(ENV_PATH):
     load_dotenv(ENV_PATH)
 
-from bot_logic.gemini_api import get_gemini_response_from_source, get_gemini_response_general, translate_text
-from bot_logic.data_processor import process_and_save_pdf, get_document_content_for_query, STORAGE_FOLDER
+from bot_logic.gemini_api import get_gemini_response_from_source, get_gemini_response_general, translate_text, GeminiError, GeminiOverloaded
+from bot_logic.data_processor import process_and_save_pdf, get_document_content_for_query, extract_best_sentences, STORAGE_FOLDER
+from bot_logic.admission import get_admission, AdmissionRejected, PRIORITY_SOURCE, PRIORITY_TRANSLATE, PRIORITY_GENERAL
 from database import init_db, list_documents, get_document_by_id, delete_document
+from snapshot import get_snapshot, ensure_snapshot, request_rebuild
 
 app = Flask(__name__, static_folder=None)
 CORS(app)
@@ -28,10 +30,31 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 init_db()
 
 
+# Map the snapshot now so the first request is warm (rebuilt here if missing or stale)
+try:
+    ensure_snapshot()
+except Exception as ex:
+    app.logger.error("Failed to prepare knowledge snapshot: %s", ex)
+
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+BUSY_MESSAGE = "The assistant is busy right now. Please try again in a moment."
+
+
+def call_llm(fn, *args, priority, **kwargs):
+    """
+    Run an LLM helper through admission control. Raises AdmissionRejected if it is shed
+    or Gemini is overloaded; config/auth failures propagate as GeminiError.
+    """
+    try:
+        return get_admission().submit(fn, *args, priority=priority, **kwargs)
+    except GeminiOverloaded as ex:
+        raise AdmissionRejected(f"LLM overloaded: {ex}")
+
+
 def detect_language_of_text(text):
     try:
         from langdetect import detect
@@ -56,28 +79,62 @@ def ask_bot():
         language = detect_language_of_text(user_query) or 'en'
 
     source_info = None
+    degraded = False
     try:
         # check FAQs quickly
-        conn = sqlite3.connect(os.path.join(BASE_DIR, 'knowledge_base.db'))
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT answer FROM faqs WHERE question LIKE ? LIMIT 1", (f"%{user_query}%",))
-        faq_row = cur.fetchone()
-        conn.close()
-
-        if faq_row:
-            response_text = faq_row['answer']
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            faq_answer = snapshot.find_faq(user_query)
+        else:
+            conn = sqlite3.connect(os.path.join(BASE_DIR, 'knowledge_base.db'))
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+            cur.execute("SELECT answer FROM faqs WHERE question LIKE ? LIMIT 1", (f"%{user_query}%",))
+            faq_row = cur.fetchone()
+            conn.close()
+            faq_answer = faq_row['answer'] if faq_row else None
+
+        if faq_answer:
+            response_text = faq_answer
             if language and language != 'en':
-                response_text = translate_text(response_text, language)
+                try:
+                    response_text = call_llm(translate_text, response_text, language, priority=PRIORITY_TRANSLATE)
+                except AdmissionRejected:
+                    # untranslated FAQ answer is still correct
+                    degraded = True
         else:
             doc_search = get_document_content_for_query(user_query)
             if doc_search:
                 combined = doc_search['combined']
                 first_doc = doc_search.get('first_doc')
                 source_info = {'id': first_doc.get('id'), 'title': first_doc.get('title'), 'filename': first_doc.get('filename')}
-                response_text = get_gemini_response_from_source(user_query, combined, source_title=source_info['title'], language_code=language)
+                try:
+                    response_text = call_llm(get_gemini_response_from_source, user_query, combined,
+                                             source_title=source_info['title'], language_code=language,
+                                             priority=PRIORITY_SOURCE)
+                except AdmissionRejected as ex:
+                    app.logger.warning("LLM shed, using extractive answer: %s", ex)
+                    degraded = True
+                    response_text, passage = extract_best_sentences(user_query, doc_search.get('all'))
+                    if passage:
+                        source_info = {'id': passage.get('id'), 'title': passage.get('title'), 'filename': passage.get('filename')}
+                        response_text = f"{response_text} ({source_info['title']})"
+                    else:
+                        source_info = None
+                        response_text = BUSY_MESSAGE
             else:
-                response_text = get_gemini_response_general(user_query, language_code=language)
+                try:
+                    response_text = call_llm(get_gemini_response_general, user_query, language_code=language,
+                                             priority=PRIORITY_GENERAL)
+                except AdmissionRejected as ex:
+                    app.logger.warning("LLM shed, no documents to fall back on: %s", ex)
+                    degraded = True
+                    response_text = BUSY_MESSAGE
+    except GeminiError as ex:
+        # not overload (e.g. bad API key): surface it instead of a degraded answer
+        app.logger.error("Gemini request failed: %s", ex)
+        source_info = None
+        response_text = str(ex)
     except Exception as ex:
         app.logger.error("Error while generating response: %s", ex)
         response_text = "Sorry, an internal error occurred while generating the response."
@@ -93,7 +150,7 @@ def ask_bot():
     except Exception as ex:
         app.logger.error("Failed to save conversation: %s", ex)
 
-    return jsonify({'response': response_text, 'source': source_info})
+    return jsonify({'response': response_text, 'source': source_info, 'degraded': degraded})
 
 
 @app.route('/admin/upload', methods=['POST'])
@@ -128,6 +185,8 @@ def upload_file():
         else:
             results.append({'filename': getattr(file, 'filename', 'unknown'), 'processed': False, 'error': 'Invalid file format'})
 
+    if any(r['processed'] for r in results):
+        request_rebuild()
     return jsonify({'results': results})
 
 
@@ -153,6 +212,7 @@ def admin_delete(doc_id):
         return jsonify({'message': 'Not found'}), 404
     filename = doc.get('filename')
     delete_document(doc_id)
+    request_rebuild()
     if filename:
         fpath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         try:
@@ -0,0 +1,177 @@
+import os
+import time
+import queue
+import itertools
+import threading
+
+# --- CONFIG ---
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))
+LLM_QUEUE_SIZE = int(os.environ.get('LLM_QUEUE_SIZE', 16))
+LLM_DEADLINE_SECONDS = float(os.environ.get('LLM_DEADLINE_SECONDS', 12))
+# Shed when the expected finish time reaches this fraction of the deadline
+LLM_SAFETY_FRACTION = float(os.environ.get('LLM_SAFETY_FRACTION', 0.8))
+# This many overloaded calls in a row (timeouts, 429/5xx) open the gate
+LLM_OVERLOAD_TRIP = int(os.environ.get('LLM_OVERLOAD_TRIP', 3))
+# While the gate is shedding, let one call through this often to re-measure
+LLM_PROBE_SECONDS = float(os.environ.get('LLM_PROBE_SECONDS', 5))
+
+# Priorities (lower runs first)
+PRIORITY_SOURCE = 0
+PRIORITY_TRANSLATE = 1
+PRIORITY_GENERAL = 2
+
+
+class AdmissionRejected(Exception):
+    """Raised when an LLM call is not admitted or cannot finish before its deadline."""
+
+
+class LLMOverloaded(Exception):
+    """Base for errors that mean the LLM backend is overloaded (timeouts, rate limits, 5xx)."""
+
+
+class _Job:
+    def __init__(self, fn, args, kwargs, budget):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.budget = budget
+        self.deadline = time.monotonic() + budget
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.probe = False
+
+
+class LLMAdmission:
+    """
+    Bounded priority queue in front of outbound LLM calls.
+    A fixed pool of worker threads drains the queue; callers wait at most until
+    their deadline. Jobs are rejected up front when the queue is full, when the
+    queued and in-flight calls at the recent average latency would not finish
+    within LLM_SAFETY_FRACTION of the deadline, or after LLM_OVERLOAD_TRIP
+    overloaded calls in a row. While shedding, one probe call is admitted every
+    LLM_PROBE_SECONDS so the gate can reopen.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, queue_size=LLM_QUEUE_SIZE):
+        self.max_concurrency = max(1, max_concurrency)
+        self._queue = queue.PriorityQueue(maxsize=max(1, queue_size))
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._avg_latency = None
+        self._inflight = 0
+        self._overloads = 0
+        self._last_probe = 0.0
+        self._workers = []
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.max_concurrency):
+                t = threading.Thread(target=self._worker, name=f"llm-admission-{i}", daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def _record_call(self, seconds, overloaded, probe=False):
+        with self._lock:
+            if self._avg_latency is None or (probe and not overloaded):
+                # a healthy probe is a fresh measurement; start the average over from it
+                self._avg_latency = seconds
+            else:
+                self._avg_latency = 0.8 * self._avg_latency + 0.2 * seconds
+            self._overloads = self._overloads + 1 if overloaded else 0
+
+    def _take_probe(self):
+        """True if a probe call may bypass the latency check now."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_probe < LLM_PROBE_SECONDS:
+                return False
+            self._last_probe = now
+            return True
+
+    def _expected_wait(self):
+        """Rough estimate of seconds until a newly queued job finishes."""
+        with self._lock:
+            avg = self._avg_latency
+            ahead = self._inflight
+        if avg is None:
+            return 0.0
+        waves = (self._queue.qsize() + ahead) // self.max_concurrency + 1
+        return waves * avg
+
+    def _should_shed(self, budget):
+        with self._lock:
+            tripped = self._overloads >= LLM_OVERLOAD_TRIP
+        if tripped:
+            return "LLM backend is overloaded"
+        if self._expected_wait() >= LLM_SAFETY_FRACTION * budget:
+            return "deadline cannot be met at current latency"
+        return None
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            try:
+                remaining = job.deadline - time.monotonic()
+                if job.cancelled or remaining <= 0:
+                    job.error = AdmissionRejected("deadline expired while queued")
+                    continue
+                with self._lock:
+                    self._inflight += 1
+                started = time.monotonic()
+                try:
+                    job.result = job.fn(*job.args, timeout=remaining, **job.kwargs)
+                except Exception as e:
+                    job.error = e
+                finally:
+                    with self._lock:
+                        self._inflight -= 1
+                elapsed = time.monotonic() - started
+                overloaded = isinstance(job.error, LLMOverloaded) or elapsed >= remaining
+                # a call can overrun its timeout (connect + read); don't let one outlier dominate
+                self._record_call(min(elapsed, job.budget), overloaded, probe=job.probe)
+            finally:
+                job.done.set()
+                self._queue.task_done()
+
+    def submit(self, fn, *args, priority=PRIORITY_GENERAL, deadline=None, **kwargs):
+        """
+        Run fn(*args, timeout=<seconds left>, **kwargs) on the pool and return its result.
+        Raises AdmissionRejected if the call is shed or misses its deadline.
+        """
+        self._ensure_workers()
+        budget = LLM_DEADLINE_SECONDS if deadline is None else deadline
+        if budget <= 0:
+            raise AdmissionRejected("no time budget left")
+        reason = self._should_shed(budget)
+        if reason and not self._take_probe():
+            raise AdmissionRejected(reason)
+
+        job = _Job(fn, args, kwargs, budget)
+        job.probe = reason is not None
+        try:
+            self._queue.put_nowait((priority, next(self._seq), job))
+        except queue.Full:
+            raise AdmissionRejected("LLM queue is full")
+
+        if not job.done.wait(budget):
+            job.cancelled = True
+            raise AdmissionRejected("deadline exceeded")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+
+_GATE = None
+_GATE_LOCK = threading.Lock()
+
+
+def get_admission():
+    global _GATE
+    with _GATE_LOCK:
+        if _GATE is None:
+            _GATE = LLMAdmission()
+        return _GATE
@@ -1,4 +1,5 @@
 import os
+import re
 from database import insert_document
 import PyPDF2
 
@@ -84,8 +85,13 @@ def process_and_save_pdf(file_path, saved_filename):
 
 def get_document_content_for_query(query, max_chars=2500):
     try:
-        from database import search_documents
-        snippets = search_documents(query, max_chars=max_chars, limit=3)
+        from snapshot import get_snapshot
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            snippets = snapshot.search_documents(query, max_chars=max_chars, limit=3)
+        else:
+            from database import search_documents
+            snippets = search_documents(query, max_chars=max_chars, limit=3)
         if not snippets:
             return None
         combined = "\n\n".join([s['excerpt'] for s in snippets])
@@ -95,3 +101,37 @@ def get_document_content_for_query(query, max_chars=2500):
     except Exception as e:
         print("Error searching documents:", e)
         return None
+
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?\u0964])\s+|\n+')
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def extract_best_sentences(query, passages, max_sentences=2):
+    """
+    No-LLM answer: pick the sentences from the search passages that share the most
+    words with the query. Returns (answer_text, passage) or (None, None).
+    """
+    terms = {w.lower() for w in _WORD.findall(query or '') if len(w) > 2}
+    if not terms:
+        return None, None
+    best_score, best_passage, best_sentences = 0, None, []
+    for passage in passages or []:
+        sentences = [s.strip() for s in _SENTENCE_SPLIT.split(passage.get('excerpt') or '') if s.strip()]
+        scored = []
+        for idx, sentence in enumerate(sentences):
+            words = {w.lower() for w in _WORD.findall(sentence)}
+            score = len(terms & words)
+            if score:
+                scored.append((score, idx, sentence))
+        if not scored:
+            continue
+        top = sorted(scored, key=lambda t: (-t[0], t[1]))[:max_sentences]
+        score = sum(t[0] for t in top)
+        if score > best_score:
+            best_score, best_passage = score, passage
+            # keep the original reading order
+            best_sentences = [t[2] for t in sorted(top, key=lambda t: t[1])]
+    if not best_sentences:
+        return None, None
+    return ' '.join(best_sentences), best_passage
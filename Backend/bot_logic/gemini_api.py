@@ -1,6 +1,9 @@
 import os
+import time
 import requests
 
+from bot_logic.admission import LLMOverloaded
+
 # --- CONFIG ---
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY') or os.environ.get('GOOGLE_API_KEY')
 if not GEMINI_API_KEY:
@@ -16,6 +19,15 @@ LANG_CODE_TO_NAME = {
     'bn': 'Bengali', 'ta': 'Tamil', 'te': 'Telugu', 'kn': 'Kannada', 'ml': 'Malayalam',
 }
 
+
+class GeminiError(Exception):
+    """Raised by call_generative_api when no usable answer comes back (config, auth, HTTP, parse)."""
+
+
+class GeminiOverloaded(GeminiError, LLMOverloaded):
+    """Gemini is slow or rate-limiting: timeouts, connection failures, HTTP 429 and 5xx."""
+
+
 # --- INTERNAL ---
 _DISCOVERED = None
 
@@ -29,10 +41,10 @@ def _candidate_bases():
             bases.append(base)
     return bases
 
-def _list_models_at_base(base):
-    """Return list of models at a given base."""
+def _list_models_at_base(base, timeout=8):
+    """Return list of models at a given base. Raises GeminiOverloaded on timeout."""
     try:
-        resp = requests.get(f"{base}/models", params={"key": GEMINI_API_KEY}, timeout=8)
+        resp = requests.get(f"{base}/models", params={"key": GEMINI_API_KEY}, timeout=timeout)
         resp.raise_for_status()
         data = resp.json()
         models = data.get('models') if isinstance(data, dict) else None
@@ -40,12 +52,14 @@ def _list_models_at_base(base):
             return models
         if isinstance(data, dict) and 'name' in data:
             return [data]
+    except (requests.Timeout, requests.ConnectionError) as e:
+        raise GeminiOverloaded(f"Model discovery failed: {e}")
     except Exception:
         pass
     return None
 
-def _discover_model_and_base(preferred_model_hint=None):
-    """Automatically discover a working base URL and model name."""
+def _discover_model_and_base(preferred_model_hint=None, deadline=None):
+    """Automatically discover a working base URL and model name, finishing by deadline (monotonic)."""
     global _DISCOVERED
     if _DISCOVERED:
         return _DISCOVERED
@@ -54,7 +68,12 @@ def _discover_model_and_base(preferred_model_hint=None):
     hint_normal = hint.split('/', 1)[-1] if hint and '/' in hint else hint
 
     for base in _candidate_bases():
-        models = _list_models_at_base(base)
+        timeout = 8
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                raise GeminiOverloaded("Deadline passed during model discovery")
+        models = _list_models_at_base(base, timeout=timeout)
         if not models:
             continue
 
@@ -97,39 +116,47 @@ def _try_post_url(url, payload, timeout):
         resp = requests.post(url, params={"key": GEMINI_API_KEY}, json=payload,
                              headers={"Content-Type": "application/json"}, timeout=timeout)
         return resp
+    except (requests.Timeout, requests.ConnectionError) as e:
+        raise GeminiOverloaded(f"Request failed: {e}")
     except Exception:
         return None
 
 def call_generative_api(prompt, max_output_tokens=512, temperature=0.7, timeout=30):
-    """Call Gemini Generative API with automatic discovery."""
+    """Call Gemini Generative API with automatic discovery. Raises GeminiError on failure."""
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {"temperature": temperature, "maxOutputTokens": max_output_tokens}
     }
 
-    discovered = _discover_model_and_base()
+    deadline = time.monotonic() + timeout
+    discovered = _discover_model_and_base(deadline=deadline)
     if not discovered:
-        return "No available model found. Check your API key and network."
+        raise GeminiError("No available model found. Check your API key and network.")
 
     base, model_full_name = discovered
     url = f"{base}/models/{model_full_name}:generateContent"
-    resp = _try_post_url(url, payload, timeout)
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise GeminiOverloaded("Deadline passed during model discovery")
+    resp = _try_post_url(url, payload, remaining)
     if resp is None:
-        return "Request failed."
+        raise GeminiError("Request failed.")
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise GeminiOverloaded(f"HTTP {resp.status_code} from Gemini")
     try:
         resp.raise_for_status()
         data = resp.json()
-        if "candidates" in data and len(data["candidates"]) > 0:
-            cand0 = data["candidates"][0]
-            parts = cand0.get("content", {}).get("parts", [])
-            if len(parts) > 0 and "text" in parts[0]:
-                return parts[0]["text"]
-        return str(data)
     except Exception as e:
-        return f"Error parsing response: {e}"
+        raise GeminiError(f"Error parsing response: {e}")
+    if "candidates" in data and len(data["candidates"]) > 0:
+        cand0 = data["candidates"][0]
+        parts = cand0.get("content", {}).get("parts", [])
+        if len(parts) > 0 and "text" in parts[0]:
+            return parts[0]["text"]
+    raise GeminiError(f"No text in response: {data}")
 
 # --- HELPER FUNCTIONS ---
-def get_gemini_response_from_source(question, source_text, source_title=None, language_code='en'):
+def get_gemini_response_from_source(question, source_text, source_title=None, language_code='en', timeout=30):
     lang_name = LANG_CODE_TO_NAME.get(language_code, language_code)
     prompt = (
         f"You are an assistant. Use ONLY the following source excerpt to answer the question. "
@@ -141,9 +168,9 @@ def get_gemini_response_from_source(question, source_text, source_title=None, la
         f"Answer in {lang_name}. Be concise — ONE short sentence. "
         f"At the end include the source title in parentheses."
     )
-    return call_generative_api(prompt, max_output_tokens=400, temperature=0.05)
+    return call_generative_api(prompt, max_output_tokens=400, temperature=0.05, timeout=timeout)
 
-def get_gemini_response_general(question, language_code='en'):
+def get_gemini_response_general(question, language_code='en', timeout=30):
     lang_name = LANG_CODE_TO_NAME.get(language_code, language_code)
     prompt = (
         f"You are an assistant for university/college info. "
@@ -152,11 +179,11 @@ def get_gemini_response_general(question, language_code='en'):
         f"If you cannot confidently answer, say: "
         f"'I don't see that information in the provided documents.'"
     )
-    return call_generative_api(prompt, max_output_tokens=300, temperature=0.05)
+    return call_generative_api(prompt, max_output_tokens=300, temperature=0.05, timeout=timeout)
 
-def translate_text(text, target_language_code):
+def translate_text(text, target_language_code, timeout=30):
     if not text:
         return text
     lang_name = LANG_CODE_TO_NAME.get(target_language_code, target_language_code)
     prompt = f"Translate the following text into {lang_name} and keep it short:\n\n{text}"
-    return call_generative_api(prompt, max_output_tokens=300, temperature=0.1)
+    return call_generative_api(prompt, max_output_tokens=300, temperature=0.1, timeout=timeout)
@@ -90,6 +90,25 @@ def init_db():
             # If ALTER TABLE fails for some reason, we keep going (DB may be in a state that needs manual migration)
             pass
 
+    # Change marker for the knowledge snapshot: bumped by triggers on any FAQ/document write,
+    # including edits made directly in SQLite
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS kb_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cur.execute("INSERT OR IGNORE INTO kb_version (id, version) VALUES (1, 0)")
+    for table in ('faqs', 'Documents'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS kb_version_{table.lower()}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE kb_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
     conn.commit()
 
     # Try to create FTS5 virtual table (if supported)
@@ -191,3 +210,34 @@ def delete_document(doc_id: int) -> bool:
         return False
     finally:
         conn.close()
+
+
+def knowledge_version() -> int:
+    """Counter bumped on every FAQ/document change; the snapshot is stale when it differs."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT version FROM kb_version WHERE id = 1").fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
+def fetch_snapshot_data():
+    """
+    Return (faqs, documents, version) for the read-only knowledge snapshot, read in one transaction:
+    faqs = [{'question','answer'}, ...], documents = [{'id','title','filename','content'}, ...]
+    """
+    conn = _connect()
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    cur.execute("SELECT version FROM kb_version WHERE id = 1")
+    row = cur.fetchone()
+    version = row[0] if row else 0
+    cur.execute("SELECT question, answer FROM faqs ORDER BY id")
+    faqs = [dict(r) for r in cur.fetchall()]
+    cur.execute("SELECT id, title, filename, content FROM Documents WHERE content IS NOT NULL AND content != '' ORDER BY id")
+    docs = [dict(r) for r in cur.fetchall()]
+    conn.commit()
+    conn.close()
+    return faqs, docs, version
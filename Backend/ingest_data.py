@@ -59,6 +59,9 @@ def ingest_data():
                 os.remove(local)
             except Exception:
                 pass
+    if pdf_links:
+        from snapshot import export_snapshot
+        print("Published snapshot:", export_snapshot())
 
 
 if __name__ == '__main__':
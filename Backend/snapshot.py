@@ -0,0 +1,381 @@
+"""
+Read-only, versioned snapshot of the FAQ and document search data.
+
+The exporter dumps knowledge_base.db into a single file; every worker memory-maps
+the current file, so the page cache holds one copy per host no matter how many
+workers run. A new file is published after each upload/delete and workers pick it
+up on their next lookup. The file can also be copied to other nodes and installed
+with `python snapshot.py --install <file>`.
+
+The header records the DB's kb_version counter (bumped by triggers on faqs and
+Documents). When the DB moves ahead, e.g. FAQs edited directly in SQLite, the
+next check rebuilds the snapshot in a background thread while requests keep
+using the current one. Nodes that only receive copied snapshots should set
+KB_SNAPSHOT_AUTO_REBUILD=0.
+
+File layout:
+    MAGIC (8 bytes) | version u64 | header_len u32 | header JSON | data
+The header only holds counts and region offsets. Data holds fixed-width FAQ and
+document tables (read with struct.unpack_from and binary-searched in place), a
+strings region for titles/filenames, and the text regions. Text entries are
+NUL-separated so one mmap.find() scans them all without a match running across
+two of them.
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import threading
+import contextlib
+
+# flock serializes exporters across workers; not available on Windows
+try:
+    import fcntl
+    FLOCK_AVAILABLE = True
+except Exception:
+    FLOCK_AVAILABLE = False
+
+from database import fetch_snapshot_data, knowledge_version
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.environ.get('KB_SNAPSHOT_DIR') or os.path.join(BASE_DIR, 'storage', 'snapshot')
+SNAPSHOT_CHECK_SECONDS = float(os.environ.get('KB_SNAPSHOT_CHECK_SECONDS', 2))
+SNAPSHOT_KEEP = 2
+SNAPSHOT_AUTO_REBUILD = os.environ.get('KB_SNAPSHOT_AUTO_REBUILD', '1') == '1'
+
+MAGIC = b'KBSNAP\x00\x02'
+_PREFIX = struct.Struct('<QI')
+# q_start, q_len, a_start, a_len
+_FAQ_REC = struct.Struct('<IIII')
+# id, title_start, title_len, filename_start, filename_len, lower_start, lower_len, text_start, text_len
+_DOC_REC = struct.Struct('<qIIIIQIQI')
+_CURRENT_NAME = 'CURRENT'
+_LOCK_NAME = 'export.lock'
+_SEP = b'\x00'
+
+
+def _pack_region(values):
+    """Concatenate byte strings with NUL separators; return (blob, starts, lengths)."""
+    starts, lengths, parts, pos = [], [], [], 0
+    for v in values:
+        starts.append(pos)
+        lengths.append(len(v))
+        parts.append(v)
+        pos += len(v) + 1
+    return _SEP.join(parts) + _SEP, starts, lengths
+
+
+def _fold(text):
+    """
+    Per-character lower() that keeps every character's UTF-8 byte length, so offsets
+    in the folded text match the original. Characters whose lowercase form has a
+    different length (e.g. 'İ', the Ohm sign) are kept as-is, in documents and queries alike.
+    """
+    table = {}
+    for c in set(text):
+        lc = c.lower()
+        if lc != c and len(lc.encode('utf-8')) == len(c.encode('utf-8')):
+            table[ord(c)] = lc
+    return text.translate(table)
+
+
+def _clean_query(query):
+    return _fold((query or '').replace('\x00', '').strip()).encode('utf-8')
+
+
+class KnowledgeSnapshot:
+    """A memory-mapped snapshot file. Lookups read straight from the mapping."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a knowledge snapshot: {path}")
+        self.version, header_len = _PREFIX.unpack_from(self._mm, len(MAGIC))
+        header_start = len(MAGIC) + _PREFIX.size
+        header = json.loads(self._mm[header_start:header_start + header_len].decode('utf-8'))
+        base = header_start + header_len
+        self.db_version = header.get('db_version')
+
+        regions = header['regions']
+        self._faq_count = header['faq_count']
+        self._doc_count = header['doc_count']
+        self._faq_table = base + regions['faq_table']
+        self._doc_table = base + regions['doc_table']
+        self._strings = base + regions['strings']
+        self._faq_q = base + regions['faq_questions']
+        self._faq_a = base + regions['faq_answers']
+        self._doc_lower = base + regions['doc_lower']
+        self._doc_text = base + regions['doc_text']
+
+    def _text(self, start, length):
+        return self._mm[start:start + length].decode('utf-8', errors='ignore')
+
+    def _entry_at(self, table, rec, count, field, rel):
+        """Binary-search a table sorted on its start-offset `field`; return the record containing rel."""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rec.unpack_from(self._mm, table + mid * rec.size)[field] <= rel:
+                lo = mid + 1
+            else:
+                hi = mid
+        return rec.unpack_from(self._mm, table + (lo - 1) * rec.size)
+
+    def find_faq(self, query):
+        """Answer of the first FAQ whose question contains query (case-insensitive), else None."""
+        needle = _clean_query(query)
+        if not needle or not self._faq_count:
+            return None
+        pos = self._mm.find(needle, self._faq_q, self._faq_a)
+        if pos == -1:
+            return None
+        _, _, a_start, a_len = self._entry_at(self._faq_table, _FAQ_REC, self._faq_count, 0, pos - self._faq_q)
+        return self._text(self._faq_a + a_start, a_len)
+
+    def search_documents(self, query, max_chars=2500, limit=5):
+        """Same result shape as database.search_documents: [{'id','title','filename','excerpt'}, ...]"""
+        needle = _clean_query(query)
+        results = []
+        if not needle or not self._doc_count:
+            return results
+        pos = self._doc_lower
+        while len(results) < limit:
+            pos = self._mm.find(needle, pos, self._doc_text)
+            if pos == -1:
+                break
+            (doc_id, ti_start, ti_len, fn_start, fn_len,
+             l_start, l_len, t_start, t_len) = self._entry_at(self._doc_table, _DOC_REC, self._doc_count,
+                                                              5, pos - self._doc_lower)
+            start = max(0, pos - self._doc_lower - l_start - 80)
+            excerpt = self._text(self._doc_text + t_start + start, min(t_len - start, max_chars * 4))
+            results.append({'id': doc_id,
+                            'title': self._text(self._strings + ti_start, ti_len),
+                            'filename': self._text(self._strings + fn_start, fn_len) or None,
+                            'excerpt': excerpt[:max_chars]})
+            pos = self._doc_lower + l_start + l_len + 1
+        return results
+
+
+def _read_current_name():
+    try:
+        with open(os.path.join(SNAPSHOT_DIR, _CURRENT_NAME), 'r') as fh:
+            return fh.read().strip() or None
+    except OSError:
+        return None
+
+
+def _atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def _export_lock():
+    """Exclusive lock across processes, held from reading the DB until CURRENT is written."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, _LOCK_NAME), 'a') as fh:
+        if FLOCK_AVAILABLE:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if FLOCK_AVAILABLE:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _publish(data, version):
+    """Write snapshot bytes as a new version, point CURRENT at it and prune old files."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    name = f"kb_{version}.snap"
+    _atomic_write(os.path.join(SNAPSHOT_DIR, name), data)
+    _atomic_write(os.path.join(SNAPSHOT_DIR, _CURRENT_NAME), name.encode('utf-8'))
+
+    # Workers still mapping a removed file keep reading it until they swap
+    old = sorted(f for f in os.listdir(SNAPSHOT_DIR) if f.startswith('kb_') and f.endswith('.snap') and f != name)
+    for f in old[:-SNAPSHOT_KEEP]:
+        try:
+            os.remove(os.path.join(SNAPSHOT_DIR, f))
+        except OSError:
+            pass
+    _reset_cache()
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def export_snapshot():
+    """Build a new snapshot from knowledge_base.db and publish it. Returns the file path."""
+    with _export_lock():
+        return _export_locked()
+
+
+def _export_locked(only_if_stale=False):
+    faqs, docs, db_version = fetch_snapshot_data()
+    current = _read_current_name()
+    if only_if_stale and current:
+        # another worker may have rebuilt it while we waited for the lock
+        try:
+            if KnowledgeSnapshot(os.path.join(SNAPSHOT_DIR, current)).db_version == db_version:
+                return os.path.join(SNAPSHOT_DIR, current)
+        except (OSError, ValueError):
+            pass
+
+    faq_q, faq_q_starts, faq_q_lens = _pack_region([_clean_query(f['question']) for f in faqs])
+    faq_a, faq_a_starts, faq_a_lens = _pack_region([(f['answer'] or '').encode('utf-8') for f in faqs])
+    doc_lower, dl_starts, dl_lens = _pack_region([_fold(d['content'] or '').encode('utf-8') for d in docs])
+    doc_text, dt_starts, dt_lens = _pack_region([(d['content'] or '').encode('utf-8') for d in docs])
+
+    strings = bytearray()
+    faq_table = b''.join(_FAQ_REC.pack(*v) for v in zip(faq_q_starts, faq_q_lens, faq_a_starts, faq_a_lens))
+    doc_rows = []
+    for i, d in enumerate(docs):
+        title = (d['title'] or '').encode('utf-8')
+        filename = (d['filename'] or '').encode('utf-8')
+        ti_start = len(strings)
+        strings += title
+        fn_start = len(strings)
+        strings += filename
+        doc_rows.append(_DOC_REC.pack(d['id'], ti_start, len(title), fn_start, len(filename),
+                                      dl_starts[i], dl_lens[i], dt_starts[i], dt_lens[i]))
+    doc_table = b''.join(doc_rows)
+    regions = [('faq_table', faq_table), ('doc_table', doc_table), ('strings', bytes(strings)),
+               ('faq_questions', faq_q), ('faq_answers', faq_a), ('doc_lower', doc_lower), ('doc_text', doc_text)]
+    offsets, pos = {}, 0
+    for name, blob in regions:
+        offsets[name] = pos
+        pos += len(blob)
+
+    current_version = int(current[3:-5]) if current and current[3:-5].isdigit() else 0
+    version = max(int(time.time() * 1000), current_version + 1)
+
+    header = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'db_version': db_version,
+        'faq_count': len(faqs),
+        'doc_count': len(docs),
+        'regions': offsets,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    data = b''.join([MAGIC, _PREFIX.pack(version, len(header_bytes)), header_bytes]
+                    + [blob for _, blob in regions])
+    return _publish(data, version)
+
+
+def install_snapshot(path):
+    """Install a snapshot file copied from another node as the current version."""
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a knowledge snapshot: {path}")
+    version, _ = _PREFIX.unpack_from(data, len(MAGIC))
+    with _export_lock():
+        return _publish(data, version)
+
+
+# --- per-process cache of the mapped snapshot ---
+_LOCK = threading.Lock()
+_LOADED = None
+_LOADED_NAME = None
+_CHECKED_AT = 0.0
+
+
+def _reset_cache():
+    global _CHECKED_AT
+    _CHECKED_AT = 0.0
+
+
+def _is_stale():
+    try:
+        return _LOADED is None or _LOADED.db_version != knowledge_version()
+    except Exception as e:
+        print("Failed to read knowledge version:", e)
+        return False
+
+
+def get_snapshot():
+    """
+    Return the current KnowledgeSnapshot, or None if none is available.
+    CURRENT is re-checked at most every SNAPSHOT_CHECK_SECONDS; a newer version is
+    mapped and swapped in, and the old mapping is released once no request uses it.
+    With SNAPSHOT_AUTO_REBUILD a missing or stale snapshot is rebuilt in the background.
+    """
+    global _CHECKED_AT
+    now = time.monotonic()
+    if _LOADED is not None and now - _CHECKED_AT < SNAPSHOT_CHECK_SECONDS:
+        return _LOADED
+    with _LOCK:
+        if _LOADED is not None and now - _CHECKED_AT < SNAPSHOT_CHECK_SECONDS:
+            return _LOADED
+        _CHECKED_AT = now
+        _load_current()
+        stale = SNAPSHOT_AUTO_REBUILD and _is_stale()
+    if stale:
+        request_rebuild()
+    return _LOADED
+
+
+def ensure_snapshot():
+    """Startup hook: map the current snapshot, rebuilding it synchronously if missing or stale."""
+    with _LOCK:
+        _load_current()
+        if SNAPSHOT_AUTO_REBUILD and _is_stale():
+            with _export_lock():
+                _export_locked(only_if_stale=True)
+            _load_current()
+        return _LOADED
+
+
+# --- background rebuilds ---
+_REBUILD_LOCK = threading.Lock()
+_REBUILD_THREAD = None
+_REBUILD_PENDING = False
+
+
+def _rebuild_loop():
+    global _REBUILD_PENDING, _REBUILD_THREAD
+    while True:
+        with _REBUILD_LOCK:
+            if not _REBUILD_PENDING:
+                _REBUILD_THREAD = None
+                return
+            _REBUILD_PENDING = False
+        try:
+            with _export_lock():
+                _export_locked(only_if_stale=True)
+        except Exception as e:
+            print("Failed to rebuild knowledge snapshot:", e)
+
+
+def request_rebuild():
+    """Rebuild the snapshot off the request path if the DB has changed since it was built."""
+    global _REBUILD_PENDING, _REBUILD_THREAD
+    with _REBUILD_LOCK:
+        _REBUILD_PENDING = True
+        if _REBUILD_THREAD is None:
+            _REBUILD_THREAD = threading.Thread(target=_rebuild_loop, name='kb-snapshot-rebuild', daemon=True)
+            _REBUILD_THREAD.start()
+
+
+def _load_current():
+    global _LOADED, _LOADED_NAME
+    name = _read_current_name()
+    if name and name != _LOADED_NAME:
+        try:
+            _LOADED = KnowledgeSnapshot(os.path.join(SNAPSHOT_DIR, name))
+            _LOADED_NAME = name
+        except (OSError, ValueError) as e:
+            print("Failed to load knowledge snapshot:", e)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--install':
+        print("Installed:", install_snapshot(sys.argv[2]))
+    else:
+        print("Exported:", export_snapshot())